@@ -7,6 +7,7 @@ Usage:
     python main.py predict 2024 Toyota Corolla Dream  # Single prediction (model must be trained)
 """
 
+import importlib.util
 import subprocess
 import sys
 import os
@@ -17,7 +18,15 @@ os.chdir(BASE_DIR)
 
 
 def install_dependencies():
-    """Auto-installs required Python packages."""
+    """
+    Auto-installs required Python packages.
+
+    Presence is checked with importlib.util.find_spec, which only looks the
+    module up instead of importing it (matplotlib/seaborn alone take
+    hundreds of ms to import).
+    """
+    from src.logger import log
+
     required = {
         "numpy": "numpy",
         "pandas": "pandas",
@@ -27,22 +36,19 @@ def install_dependencies():
         "python-docx": "docx",
     }
 
-    missing = []
-    for pkg, import_name in required.items():
-        try:
-            __import__(import_name)
-        except ImportError:
-            missing.append(pkg)
+    missing = [
+        pkg for pkg, import_name in required.items()
+        if importlib.util.find_spec(import_name) is None
+    ]
 
     if missing:
-        from src.logger import log
         log.warning(f"Installing: {', '.join(missing)}")
         subprocess.check_call(
             [sys.executable, "-m", "pip", "install", "--quiet"] + missing
         )
+        importlib.invalidate_caches()
         log.success("Packages installed successfully")
     else:
-        from src.logger import log
         log.success("All dependencies available")
 
 
@@ -66,12 +72,10 @@ def main():
 
     # 3. Clean + Train
     log.step(3, 4, "Cleaning data & training models...")
-    from src.preprocessing import load_data, clean_data, encode_features
+    from src.preprocessing import load_prepared
     from src.model import train_models, save_model, show_sample_predictions
 
-    df = load_data(os.path.join(BASE_DIR, "output", "cars.json"))
-    df = clean_data(df)
-    _, encoders = encode_features(df)
+    df, encoders = load_prepared(os.path.join(BASE_DIR, "output", "cars.json"))
     best_model, _, encoders, _, _ = train_models(df, encoders)
 
     save_model(best_model, encoders)
@@ -117,6 +121,9 @@ def interactive_prediction():
     brands = sorted(encoders["brand"].classes_)
     log.info(f"Mevcut markalar: {', '.join(brands)}")
 
+    # Known labels per column, checked as soon as each value is entered
+    known = {col: encoders[col].mapping for col in ("brand", "model", "package")}
+
     while True:
         print()
         year_input = input("  Yil (orn. 2024): ").strip()
@@ -126,14 +133,23 @@ def interactive_prediction():
         brand = input("  Marka (orn. Toyota): ").strip()
         if brand.lower() == "exit":
             break
+        if brand not in known["brand"]:
+            log.error(f"Bilinmeyen marka: '{brand}'")
+            continue
 
         model_name = input("  Model (orn. Corolla): ").strip()
         if model_name.lower() == "exit":
             break
+        if model_name not in known["model"]:
+            log.error(f"Bilinmeyen model: '{model_name}'")
+            continue
 
         package = input("  Paket (orn. Dream): ").strip()
         if package.lower() == "exit":
             break
+        if package not in known["package"]:
+            log.error(f"Bilinmeyen paket: '{package}'")
+            continue
 
         try:
             price = predict_price(int(year_input), brand, model_name, package)
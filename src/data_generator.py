@@ -3,14 +3,15 @@ Vehicle Price Estimation - Synthetic Data Generation Module
 Generates realistic synthetic data for the Turkish automobile market.
 """
 
-import json
-import random
 import os
 
+import numpy as np
+import pandas as pd
+
 from src.logger import log
 
 # Fixed seed for reproducibility
-random.seed(42)
+_rng = np.random.default_rng(42)
 
 # ============================================================
 # Brand-model-package definitions and base prices for Turkish market
@@ -451,58 +452,110 @@ def _package_multiplier(package_index, total_packages):
     return 1.0 + (package_index / (total_packages - 1)) * 0.18
 
 
-def generate_data(n=10000):
-    """
-    Generates realistic new vehicle data.
+# Package multiplier lookup: PKG_MULT_TABLE[total_packages - 1, package_index]
+_MAX_PACKAGES = max(
+    len(info["packages"]) for models in VEHICLE_CATALOG.values() for info in models.values()
+)
+PKG_MULT_TABLE = np.array([
+    [_package_multiplier(i, t) if i < t else np.nan for i in range(_MAX_PACKAGES)]
+    for t in range(1, _MAX_PACKAGES + 1)
+])
 
-    Each record: {year, brand, model, package, price}
-    Price = base_price * year_multiplier * package_multiplier * random_noise
-    """
-    records = []
 
-    combinations = []
+def _flatten_catalog():
+    """
+    Flattens VEHICLE_CATALOG into one row per (brand, model, package, year)
+    combination, with the year and package multipliers precomputed.
+    """
+    rows = []
     for brand, models in VEHICLE_CATALOG.items():
         for model_name, info in models.items():
+            total_packages = len(info["packages"])
             for year in YEARS:
                 for pkg_idx, package in enumerate(info["packages"]):
-                    combinations.append({
-                        "brand": brand,
-                        "model": model_name,
-                        "package": package,
-                        "year": year,
-                        "base_price": info["base_price"],
-                        "pkg_idx": pkg_idx,
-                        "total_packages": len(info["packages"]),
-                    })
+                    rows.append((
+                        brand, model_name, package, year,
+                        info["base_price"], info["segment"],
+                        pkg_idx, total_packages,
+                        YEAR_MULTIPLIER[year],
+                    ))
+    catalog = pd.DataFrame(rows, columns=[
+        "brand", "model", "package", "year",
+        "base_price", "segment",
+        "pkg_idx", "total_packages",
+        "year_mult",
+    ])
+    catalog["pkg_mult"] = PKG_MULT_TABLE[
+        catalog["total_packages"].to_numpy() - 1, catalog["pkg_idx"].to_numpy()
+    ]
+    return catalog
+
+
+# Flat (structure-of-arrays) view of the catalog, built once at import
+CATALOG_DF = _flatten_catalog()
+
+# Record count from which the numba kernel is worth its import/compile cost
+_NUMBA_MIN_RECORDS = 1_000_000
+
+
+def _price_records(base, year_mult, pkg_mult, idx, noise):
+    """
+    Prices the sampled catalog rows, rounded to the nearest 10,000 TL.
+
+    Large batches use the compiled numba kernel when numba is installed; it
+    runs in parallel and allocates no gathered intermediate arrays.
+    """
+    if idx.size >= _NUMBA_MIN_RECORDS:
+        try:
+            from src.numba_kernels import price_records
+        except ImportError:
+            pass
+        else:
+            return price_records(base, year_mult, pkg_mult, idx, noise)
+
+    prices = base[idx] * year_mult[idx] * pkg_mult[idx] * noise
+    return (np.round(prices / 10_000) * 10_000).astype(np.int64)
 
-    log.info(f"Total possible combinations: {len(combinations)}")
 
-    while len(records) < n:
-        combo = random.choice(combinations)
+def generate_data(n=10000):
+    """
+    Generates realistic new vehicle data.
+
+    Each record: {year, brand, model, package, price}
+    Price = base_price * year_multiplier * package_multiplier * random_noise
 
-        year_mult = YEAR_MULTIPLIER[combo["year"]]
-        pkg_mult = _package_multiplier(combo["pkg_idx"], combo["total_packages"])
-        noise = random.uniform(0.93, 1.07)
+    Records are sampled from the rows of CATALOG_DF and priced in a single
+    vectorized pass. Returns a DataFrame with one row per record.
+    """
+    log.info(f"Total possible combinations: {len(CATALOG_DF)}")
 
-        price = combo["base_price"] * year_mult * pkg_mult * noise
-        price = round(price / 10_000) * 10_000
+    idx = _rng.integers(0, len(CATALOG_DF), size=n)
+    noise = _rng.uniform(0.93, 1.07, size=n)
 
-        records.append({
-            "year": combo["year"],
-            "brand": combo["brand"],
-            "model": combo["model"],
-            "package": combo["package"],
-            "price": int(price),
-        })
+    prices = _price_records(
+        CATALOG_DF["base_price"].to_numpy(dtype=np.float64),
+        CATALOG_DF["year_mult"].to_numpy(),
+        CATALOG_DF["pkg_mult"].to_numpy(),
+        idx,
+        noise,
+    )
 
-    return records
+    data = CATALOG_DF[["year", "brand", "model", "package"]].take(idx)
+    return data.assign(price=prices).reset_index(drop=True)
 
 
 def save_data(data, path="output/cars.json"):
-    """Saves data to a JSON file."""
+    """
+    Saves data to a JSON file as an array of records, or as one record per
+    line when path ends with ``.jsonl``.
+
+    Accepts the DataFrame returned by generate_data (or a list of dicts) and
+    serializes it with pandas' C JSON encoder.
+    """
+    if not isinstance(data, pd.DataFrame):
+        data = pd.DataFrame(data)
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    data.to_json(path, orient="records", lines=path.endswith(".jsonl"), force_ascii=False)
     log.success(f"{len(data)} records saved to '{path}'")
 
 
@@ -510,14 +563,12 @@ if __name__ == "__main__":
     records = generate_data(10000)
     save_data(records)
 
-    prices = [r["price"] for r in records]
-    brands = set(r["brand"] for r in records)
-    models = set(r["model"] for r in records)
+    prices = records["price"]
 
     log.section("Dataset Summary")
     log.metric("Total records", f"{len(records):,}")
-    log.metric("Brand count", len(brands))
-    log.metric("Model count", len(models))
-    log.metric("Min price", f"{min(prices):>12,} TL")
-    log.metric("Max price", f"{max(prices):>12,} TL")
-    log.metric("Average price", f"{sum(prices)//len(prices):>12,} TL")
+    log.metric("Brand count", records["brand"].nunique())
+    log.metric("Model count", records["model"].nunique())
+    log.metric("Min price", f"{prices.min():>12,} TL")
+    log.metric("Max price", f"{prices.max():>12,} TL")
+    log.metric("Average price", f"{int(prices.mean()):>12,} TL")
@@ -0,0 +1,35 @@
+"""
+Vehicle Price Estimation - Custom Estimators
+Lightweight sklearn-compatible regressors used by the model module.
+"""
+
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin
+
+
+class LeastSquaresRegressor(RegressorMixin, BaseEstimator):
+    """
+    Ordinary least squares solved via the normal equations.
+
+    Equivalent to LinearRegression for this problem, but with only four
+    features the centered 4x4 system is solved directly instead of running
+    an SVD-based lstsq. Singular systems fall back to lstsq.
+    """
+
+    def fit(self, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        X_mean = X.mean(axis=0)
+        y_mean = y.mean()
+        Xc = X - X_mean
+        try:
+            self.coef_ = np.linalg.solve(Xc.T @ Xc, Xc.T @ (y - y_mean))
+        except np.linalg.LinAlgError:
+            # Rank-deficient input (e.g. a constant column after filtering
+            # to one year or brand): minimum-norm solution, as LinearRegression
+            self.coef_ = np.linalg.lstsq(Xc, y - y_mean, rcond=None)[0]
+        self.intercept_ = y_mean - X_mean @ self.coef_
+        return self
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef_ + self.intercept_
@@ -6,6 +6,13 @@ Simple colored logger for clean terminal output.
 class Logger:
     """Formatted terminal output with ANSI colors."""
 
+    # Levels (same values as the standard logging module); messages below
+    # ``level`` are dropped
+    DEBUG = 10
+    INFO = 20
+    WARNING = 30
+    ERROR = 40
+
     # ANSI escape codes
     _R = "\033[0m"       # Reset
     _B = "\033[1m"       # Bold
@@ -17,8 +24,18 @@ class Logger:
     _MAG = "\033[95m"
     _CYN = "\033[96m"
 
+    def __init__(self, level=INFO):
+        self.level = level
+
+    def is_enabled_for(self, level):
+        """Whether messages of the given level are printed; lets callers skip
+        building messages that would be dropped."""
+        return level >= self.level
+
     def header(self, title, subtitle=""):
         """Print a prominent header block."""
+        if not self.is_enabled_for(self.INFO):
+            return
         line = "=" * 60
         print(f"\n{self._CYN}{line}{self._R}")
         print(f"  {self._B}{title}{self._R}")
@@ -28,6 +45,8 @@ class Logger:
 
     def section(self, title):
         """Print a section divider."""
+        if not self.is_enabled_for(self.INFO):
+            return
         line = "-" * 60
         print(f"\n{self._CYN}{line}{self._R}")
         print(f"  {self._B}{title}{self._R}")
@@ -35,34 +54,50 @@ class Logger:
 
     def step(self, current, total, msg):
         """Print a pipeline step indicator."""
+        if not self.is_enabled_for(self.INFO):
+            return
         print(f"\n{self._MAG}[{current}/{total}]{self._R} {self._B}{msg}{self._R}")
 
     def info(self, msg):
         """Print an info message."""
+        if not self.is_enabled_for(self.INFO):
+            return
         print(f"  {self._BLU}>{self._R} {msg}")
 
     def success(self, msg):
         """Print a success message."""
+        if not self.is_enabled_for(self.INFO):
+            return
         print(f"  {self._GRN}>{self._R} {msg}")
 
     def warning(self, msg):
         """Print a warning message."""
+        if not self.is_enabled_for(self.WARNING):
+            return
         print(f"  {self._YLW}>{self._R} {msg}")
 
     def error(self, msg):
         """Print an error message."""
+        if not self.is_enabled_for(self.ERROR):
+            return
         print(f"  {self._RED}>{self._R} {msg}")
 
     def metric(self, label, value):
         """Print a label-value pair."""
+        if not self.is_enabled_for(self.INFO):
+            return
         print(f"  {self._D}{label:<28s}{self._R}: {value}")
 
     def result(self, msg):
         """Print a highlighted result."""
+        if not self.is_enabled_for(self.INFO):
+            return
         print(f"\n  {self._GRN}{self._B}{msg}{self._R}")
 
     def table(self, headers, rows):
         """Print a formatted table."""
+        if not self.is_enabled_for(self.INFO):
+            return
         widths = []
         for i in range(len(headers)):
             max_w = len(str(headers[i]))
@@ -81,6 +116,8 @@ class Logger:
             print(f"  {row_str}")
 
     def blank(self):
+        if not self.is_enabled_for(self.INFO):
+            return
         print()
 
 
@@ -0,0 +1,28 @@
+"""
+Vehicle Price Estimation - Numba Kernels
+Compiled loops used for large inputs. Importing this module requires numba;
+callers fall back to their NumPy implementation when it is not installed.
+"""
+
+import numpy as np
+from numba import njit, prange
+
+
+@njit(cache=True, parallel=True)
+def price_records(base, year_mult, pkg_mult, idx, noise):
+    """Prices the sampled catalog rows, rounded to the nearest 10,000 TL."""
+    prices = np.empty(idx.size, dtype=np.int64)
+    for i in prange(idx.size):
+        j = idx[i]
+        price = base[j] * year_mult[j] * pkg_mult[j] * noise[i]
+        prices[i] = np.int64(np.round(price / 10_000) * 10_000)
+    return prices
+
+
+@njit(cache=True, parallel=True)
+def keep_mask(notna, prices, lower_bound, upper_bound):
+    """Rows without missing values whose price lies within the bounds."""
+    out = np.empty(prices.size, dtype=np.bool_)
+    for i in prange(prices.size):
+        out[i] = notna[i] and lower_bound <= prices[i] <= upper_bound
+    return out
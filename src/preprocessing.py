@@ -3,19 +3,208 @@ Vehicle Price Estimation - Data Preprocessing Module
 Handles data loading, cleaning, encoding, and feature engineering.
 """
 
+import contextlib
+import hashlib
 import json
+import mmap
+import os
+import pickle
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
+
+try:
+    import orjson
+except ImportError:  # optional, faster JSON parser
+    orjson = None
+
+try:
+    import pyarrow as pa
+    from pyarrow import json as pa_json
+except ImportError:  # optional, streaming reader for JSON lines files
+    pa_json = None
+
+try:
+    import numexpr
+except ImportError:  # optional, fused multithreaded mask evaluation
+    numexpr = None
 
 from src.logger import log
 
+# Column dtypes of the vehicle dataset, enforced at load time. Narrow types
+# keep the working set small: labels are stored as small integer codes and
+# TL prices fit comfortably in int32.
+DTYPES = {
+    "year": "int16",
+    "brand": "category",
+    "model": "category",
+    "package": "category",
+    "price": "int32",
+}
+
+# Below this size numexpr's dispatch overhead outweighs the fused loop. It
+# only pays off multithreaded; on a single core NumPy's kernels are faster.
+_NUMEXPR_MIN_ROWS = 100_000
+
+# Row count from which the numba mask kernel is worth its import and
+# load cost (~0.5 s per process, even with the compiled kernel cached)
+_NUMBA_MIN_ROWS = 10_000_000
+
+# Block size of pyarrow's JSON lines reader (its default is 1 MiB)
+_JSON_BLOCK_SIZE = 8 << 20
+
+# Part of the load_prepared cache key; bump when cleaning or encoding changes
+_PREPARED_CACHE_VERSION = 2
+
+# Columns are encoded on worker threads (pandas' hashing releases the GIL)
+# only when there is enough work to amortize the thread start-up.
+_PARALLEL_ENCODE_MIN_ROWS = 100_000
+
+CATEGORICAL_COLUMNS = ["brand", "model", "package"]
+
+
+class EncodeResult(NamedTuple):
+    """Model inputs returned by encode_features."""
+
+    X: np.ndarray
+    y: np.ndarray
+    encoders: dict
+
+
+class CategoryEncoder:
+    """
+    Maps category labels to integer codes via a pandas Index hashtable.
+
+    Exposes the same ``classes_`` / ``transform`` interface as sklearn's
+    LabelEncoder (codes follow the sorted label order), plus a ``mapping``
+    dict for O(1) single-value lookups at prediction time. Only the
+    ``classes_`` array is pickled; the lookup structures are rebuilt on load.
+    """
+
+    __slots__ = ("classes_", "_index", "mapping")
+
+    def __init__(self, categories):
+        self._set_classes(np.asarray(sorted(categories), dtype=object))
+
+    def _set_classes(self, classes):
+        self.classes_ = classes
+        self._index = pd.Index(classes)
+        self.mapping = {label: code for code, label in enumerate(classes)}
+
+    def __getstate__(self):
+        return {"classes_": self.classes_}
+
+    def __setstate__(self, state):
+        self._set_classes(state["classes_"])
+
+    def transform(self, values):
+        """Returns the integer codes of values; raises ValueError on unseen labels."""
+        codes = self._index.get_indexer(values)
+        if (codes < 0).any():
+            unseen = sorted(set(np.asarray(values, dtype=object)[codes < 0]))
+            raise ValueError(f"y contains previously unseen labels: {unseen}")
+        return codes
+
+
+@contextlib.contextmanager
+def _mapped(path):
+    """Yields a read-only memoryview of the memory-mapped file at path."""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        with memoryview(mm) as view:
+            yield view
+
+
+def _read_json_lines(path):
+    """Reads a newline-delimited JSON file into a DataFrame."""
+    if pa_json is not None:
+        # Parsed block by block from the memory-mapped file straight into
+        # Arrow columns; the Arrow buffers are released while pandas takes
+        # them over, which keeps peak memory close to the final frame size.
+        read_options = pa_json.ReadOptions(block_size=_JSON_BLOCK_SIZE)
+        with pa.memory_map(path) as source:
+            table = pa_json.read_json(source, read_options=read_options)
+        return table.to_pandas(
+            strings_to_categorical=True, self_destruct=True, split_blocks=True
+        )
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(path, "rb") as f:
+        return pd.DataFrame.from_records([loads(line) for line in f if line.strip()])
+
 
 def load_data(path):
-    """Loads a JSON dataset and returns a DataFrame."""
-    with open(path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    df = pd.DataFrame(data)
-    return df
+    """
+    Loads a JSON dataset and returns a DataFrame.
+
+    ``.jsonl`` files (one record per line) are streamed through pyarrow's
+    JSON reader when it is installed. Other files hold an array of records
+    and are parsed with orjson when it is installed, falling back to the
+    standard library json module. Columns are cast to DTYPES, so the result
+    does not depend on the parser or on pandas' inference defaults.
+    Integer columns with missing values stay float until clean_data drops
+    those rows.
+    """
+    if path.endswith(".jsonl"):
+        df = _read_json_lines(path)
+    elif orjson is not None:
+        # orjson parses straight from the mapped pages, so the file contents
+        # are not copied into a bytes object first
+        with _mapped(path) as view:
+            data = orjson.loads(view)
+        df = pd.DataFrame.from_records(data)
+    else:
+        with open(path, "rb") as f:
+            data = json.load(f)
+        df = pd.DataFrame.from_records(data)
+    return _cast_to_dtypes(df, {
+        col: dtype for col, dtype in DTYPES.items()
+        if not (pd.api.types.is_integer_dtype(dtype) and df[col].hasnans)
+    })
+
+
+def _cast_to_dtypes(df, dtypes):
+    """
+    Casts columns of df to dtypes. Values outside the range of an integer
+    dtype raise ValueError instead of silently wrapping around.
+    """
+    for col, dtype in dtypes.items():
+        if not pd.api.types.is_integer_dtype(dtype) or df[col].empty:
+            continue
+        info = np.iinfo(dtype)
+        lowest, highest = df[col].min(), df[col].max()
+        if lowest < info.min or highest > info.max:
+            value = highest if highest > info.max else lowest
+            raise ValueError(f"{col} exceeds the {dtype} range of DTYPES: {value:,}")
+    return df.astype(dtypes)
+
+
+def _sorted_quantile(sorted_values, q):
+    """np.quantile's default (linear) interpolation on an already sorted array."""
+    pos = (sorted_values.size - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, sorted_values.size - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def _keep_mask(notna_mask, prices, lower_bound, upper_bound):
+    """Rows without missing values whose price lies within the IQR bounds."""
+    if prices.size >= _NUMBA_MIN_ROWS:
+        try:
+            from src.numba_kernels import keep_mask
+        except ImportError:
+            pass
+        else:
+            return keep_mask(notna_mask, prices, lower_bound, upper_bound)
+    if numexpr is not None and numexpr.nthreads > 1 and prices.size >= _NUMEXPR_MIN_ROWS:
+        # Single fused pass, no intermediate boolean arrays
+        return numexpr.evaluate(
+            "notna_mask & (prices >= lower_bound) & (prices <= upper_bound)",
+            local_dict={"notna_mask": notna_mask, "prices": prices,
+                        "lower_bound": lower_bound, "upper_bound": upper_bound},
+        )
+    return notna_mask & (prices >= lower_bound) & (prices <= upper_bound)
 
 
 def clean_data(df):
@@ -26,75 +215,238 @@ def clean_data(df):
     3. Outlier detection (IQR method for prices)
     4. Duplicate record removal
     """
-    log.section("DATA CLEANING REPORT")
+    df, report = _clean(df)
+    _log_cleaning_report(report)
+    return df
+
+
+def _clean(df):
+    """Runs the clean_data steps; returns the cleaned frame and its report."""
     initial_count = len(df)
+    dtypes = {col: df[col].dtype for col in ("year", "brand", "model", "package", "price")}
+
+    # Rows are not dropped step by step: the missing-value and outlier masks
+    # are combined and applied with a single .iloc, so the frame is copied
+    # at most once.
 
-    # 1. Missing values
-    total_missing = df.isnull().sum().sum()
-    if total_missing > 0:
-        df = df.dropna()
-        log.warning(f"Missing values: {total_missing} -> rows removed, remaining: {len(df)}")
+    # 1. Missing values. The per-column check stops at the first column with
+    # gaps; complete data (the common case) skips the row-wise mask.
+    if any(df[col].hasnans for col in df.columns):
+        notna_mask = df.notna().all(axis=1).to_numpy()
+        missing_rows = int(notna_mask.size - notna_mask.sum())
     else:
-        log.info(f"Missing values: {total_missing}")
-
-    # 2. Data type validation
-    log.info("Data types validated:")
-    log.metric("year", f"{df['year'].dtype} (int)")
-    log.metric("brand", f"{df['brand'].dtype} (str)")
-    log.metric("model", f"{df['model'].dtype} (str)")
-    log.metric("package", f"{df['package'].dtype} (str)")
-    log.metric("price", f"{df['price'].dtype} (int)")
-
-    df["year"] = df["year"].astype(int)
-    df["price"] = df["price"].astype(int)
-
-    # 3. Outlier detection (IQR for price)
-    Q1 = df["price"].quantile(0.25)
-    Q3 = df["price"].quantile(0.75)
-    IQR = Q3 - Q1
-    lower_bound = Q1 - 1.5 * IQR
-    upper_bound = Q3 + 1.5 * IQR
-    outlier_count = ((df["price"] < lower_bound) | (df["price"] > upper_bound)).sum()
-
-    log.info(f"Outlier detection (IQR): Q1={Q1:,.0f}, Q3={Q3:,.0f}, IQR={IQR:,.0f}")
-    log.metric("Bounds", f"{lower_bound:,.0f} - {upper_bound:,.0f} TL")
+        notna_mask = np.ones(initial_count, dtype=bool)
+        missing_rows = 0
+
+    # 3. Outlier detection (IQR for price, over rows without missing values)
+    # The prices are sorted once: quartiles are read off the sorted array and
+    # the outlier count comes from two binary searches, so the mask is only
+    # built when something has to be removed.
+    prices = df["price"].to_numpy()
+    sorted_prices = np.sort(prices[notna_mask] if missing_rows else prices)
+    if sorted_prices.size == 0:
+        # Every row had a missing value: no bounds, nothing to filter
+        Q1 = Q3 = lower_bound = upper_bound = np.nan
+        outlier_count = 0
+    else:
+        Q1 = _sorted_quantile(sorted_prices, 0.25)
+        Q3 = _sorted_quantile(sorted_prices, 0.75)
+        IQR = Q3 - Q1
+        lower_bound = Q1 - 1.5 * IQR
+        upper_bound = Q3 + 1.5 * IQR
+        lo_idx = np.searchsorted(sorted_prices, lower_bound, side="left")
+        hi_idx = np.searchsorted(sorted_prices, upper_bound, side="right")
+        outlier_count = int(lo_idx + (sorted_prices.size - hi_idx))
+
     if outlier_count > 0:
-        df = df[(df["price"] >= lower_bound) & (df["price"] <= upper_bound)]
-        log.warning(f"Outliers removed: {outlier_count} records, remaining: {len(df)}")
+        df = df.iloc[_keep_mask(notna_mask, prices, lower_bound, upper_bound)]
+    elif missing_rows > 0:
+        df = df.iloc[notna_mask]
+    # load_data already casts these unless the column had missing values
+    narrow = {
+        col: DTYPES[col] for col in ("year", "price")
+        if df[col].dtype != DTYPES[col]
+    }
+    if narrow:
+        df = _cast_to_dtypes(df, narrow)
+
+    # 4. Duplicate records (single hashing pass; also resets the index)
+    before = len(df)
+    df = df.drop_duplicates(ignore_index=True)
+
+    report = {
+        "initial": initial_count,
+        "missing": missing_rows,
+        "dtypes": dtypes,
+        "Q1": Q1,
+        "Q3": Q3,
+        "bounds": (lower_bound, upper_bound),
+        "outliers": outlier_count,
+        "duplicates": before - len(df),
+        "final": len(df),
+    }
+    return df, report
+
+
+def _log_cleaning_report(report):
+    """Logs the DATA CLEANING REPORT section for a clean_data report."""
+    if not log.is_enabled_for(log.WARNING):
+        return
+    log.section("DATA CLEANING REPORT")
+    remaining = report["initial"] - report["missing"]
+    if report["missing"] > 0:
+        log.warning(
+            f"Missing values: {report['missing']} rows removed, remaining: {remaining}"
+        )
     else:
-        log.info(f"Outliers: {outlier_count}")
+        log.info(f"Missing values: {report['missing']}")
+
+    # Data type validation
+    if log.is_enabled_for(log.INFO):
+        kinds = {
+            "year": "int", "brand": "str", "model": "str", "package": "str", "price": "int",
+        }
+        log.info("Data types validated:")
+        for col, dtype in report["dtypes"].items():
+            log.metric(col, f"{dtype} ({kinds[col]})")
 
-    # 4. Duplicate records
-    duplicates = df.duplicated().sum()
-    if duplicates > 0:
-        df = df.drop_duplicates()
-        log.warning(f"Duplicates removed: {duplicates} records, remaining: {len(df)}")
+    Q1, Q3 = report["Q1"], report["Q3"]
+    lower_bound, upper_bound = report["bounds"]
+    remaining -= report["outliers"]
+    log.info(f"Outlier detection (IQR): Q1={Q1:,.0f}, Q3={Q3:,.0f}, IQR={Q3 - Q1:,.0f}")
+    log.metric("Bounds", f"{lower_bound:,.0f} - {upper_bound:,.0f} TL")
+    if report["outliers"] > 0:
+        log.warning(f"Outliers removed: {report['outliers']} records, remaining: {remaining}")
     else:
-        log.info(f"Duplicates: {duplicates}")
+        log.info(f"Outliers: {report['outliers']}")
 
-    removed = initial_count - len(df)
-    log.success(f"Cleaned: {initial_count:,} -> {len(df):,} records ({removed} removed)")
+    if report["duplicates"] > 0:
+        log.warning(
+            f"Duplicates removed: {report['duplicates']} records, "
+            f"remaining: {report['final']}"
+        )
+    else:
+        log.info(f"Duplicates: {report['duplicates']}")
 
-    return df.reset_index(drop=True)
+    removed = report["initial"] - report["final"]
+    log.success(
+        f"Cleaned: {report['initial']:,} -> {report['final']:,} records ({removed} removed)"
+    )
 
 
-def encode_features(df):
+def _encode_column(column):
+    """Returns the CategoryEncoder and int32 codes of one categorical column."""
+    # One hashtable pass yields both the labels that occur and their codes.
+    # On categorical columns (as loaded by load_data) it runs over the small
+    # integer codes, and labels whose rows were all removed by clean_data
+    # drop out instead of becoming valid inputs.
+    codes, uniques = pd.factorize(column, sort=True)
+    uniques = pd.Index(np.asarray(uniques, dtype=object))
+    if not uniques.is_monotonic_increasing:
+        # Categoricals sort by category order (for pyarrow-built ones, order
+        # of appearance); codes must follow CategoryEncoder's sorted labels
+        order = uniques.argsort()
+        remap = np.empty(len(order) + 1, dtype=np.intp)
+        remap[order] = np.arange(len(order))
+        remap[-1] = -1  # missing values keep the -1 code
+        codes = remap[codes]
+        uniques = uniques[order]
+    return CategoryEncoder(uniques), codes.astype(np.int32, copy=False)
+
+
+def encode_features(df, encoders=None, target="price"):
     """
-    Encodes categorical variables (brand, model, package) using LabelEncoder.
-    Returns the encoded DataFrame and a dict of encoders.
+    Encodes categorical variables (brand, model, package) as integer codes
+    and returns an EncodeResult with the model inputs. X holds the columns
+    year, brand, model, package as float32 (exact for these small integers
+    and the dtype the models use), y the target column. New encoders are
+    fitted unless already fitted ones are passed in.
 
-    Note: LabelEncoder assigns arbitrary integers to categories. This creates
+    Note: label encoding assigns arbitrary integers to categories. This creates
     a false ordinal relationship (e.g. Audi=0, BMW=1 does NOT mean BMW > Audi).
     Tree-based models (Random Forest, Gradient Boosting) handle this correctly
     because they split on individual values. However, Linear Regression treats
     these as ordinal numbers, which partially explains its poor performance.
     """
-    encoders = {}
-    df_encoded = df.copy()
+    columns = [df[col] for col in CATEGORICAL_COLUMNS]
+    if encoders is not None:
+        codes = [
+            encoders[col].transform(column)
+            for col, column in zip(CATEGORICAL_COLUMNS, columns)
+        ]
+    else:
+        if len(df) >= _PARALLEL_ENCODE_MIN_ROWS:
+            with ThreadPoolExecutor(max_workers=len(columns)) as pool:
+                encoded = list(pool.map(_encode_column, columns))
+        else:
+            encoded = [_encode_column(column) for column in columns]
+        encoders = {col: encoder for col, (encoder, _) in zip(CATEGORICAL_COLUMNS, encoded)}
+        codes = [col_codes for _, col_codes in encoded]
+
+    # Written column by column into one matrix, without an intermediate
+    # encoded DataFrame
+    X = np.empty((len(df), 1 + len(codes)), dtype=np.float32)
+    X[:, 0] = df["year"].to_numpy()
+    for i, col_codes in enumerate(codes, start=1):
+        X[:, i] = col_codes
+
+    return EncodeResult(X, df[target].to_numpy(), encoders)
+
+
+def load_prepared(path, cache_dir=None):
+    """
+    Returns the cleaned DataFrame and the encoders for the dataset at path.
+
+    load_data -> clean_data -> encode_features is deterministic, so the
+    result is cached as a pickle (which keeps the narrow dtypes) keyed by a
+    BLAKE2 hash of the file contents and the pandas/numpy versions. Repeat
+    runs on identical data, such as the regenerated cars.json, skip parsing
+    and cleaning; the cleaning report is stored with the frame and logged
+    again. An unreadable cache entry is rebuilt. The cache lives in a
+    ``.cache`` directory next to the data file unless cache_dir is given,
+    and keeps one entry per data file name.
+    """
+    with _mapped(path) as view:
+        digest = hashlib.blake2b(view, digest_size=16)
+    versions = f"{_PREPARED_CACHE_VERSION}:{pd.__version__}:{np.__version__}"
+    digest.update(versions.encode())
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(path), ".cache")
+    prefix = f"{os.path.basename(path)}-"
+    cache_path = os.path.join(cache_dir, f"{prefix}{digest.hexdigest()}.pkl")
+
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, "rb") as f:
+                df, encoders, report = pickle.load(f)
+        except Exception as e:
+            log.warning(f"Prepared data cache unreadable ({type(e).__name__}), rebuilding")
+        else:
+            _log_cleaning_report(report)
+            log.info(f"Prepared data loaded from cache: {len(df):,} records")
+            return df, encoders
+
+    df, report = _clean(load_data(path))
+    _log_cleaning_report(report)
+    encoders = encode_features(df).encoders
 
-    for col in ["brand", "model", "package"]:
-        le = LabelEncoder()
-        df_encoded[col] = le.fit_transform(df[col])
-        encoders[col] = le
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump((df, encoders, report), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
-    return df_encoded, encoders
+    # Entries for earlier contents of the same file are never hit again. The
+    # full-name match keeps entries of other files whose names share the
+    # prefix (e.g. cars.json-2025.json next to cars.json).
+    entry = re.compile(re.escape(prefix) + r"[0-9a-f]{32}\.pkl")
+    current = os.path.basename(cache_path)
+    for name in os.listdir(cache_dir):
+        if name != current and entry.fullmatch(name):
+            os.remove(os.path.join(cache_dir, name))
+    return df, encoders